@@ -1,5 +1,5 @@
 
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QObject, QThread, pyqtSignal
 from PyQt6.QtWidgets import QApplication, QWidget, QPushButton, QMainWindow, QLabel, QComboBox, QCheckBox, QVBoxLayout, QLineEdit, QTextEdit, QHBoxLayout
 from PyQt6.QtGui import QAction, QPixmap
 import sys
@@ -9,9 +9,35 @@ UI_DIR = Path(__file__).parent / "UI"
 PATH = UI_DIR / "UULogo.png"
 LOGO_PATH = str(PATH)
 
+BASE_DIR = Path(__file__).parent.parent
+
 
 import sys
 
+class LoaderWorker(QObject):
+    """
+    Loads the heavy pipeline (classifier, RDF graph, RAG index) on a
+    background thread so the window can show immediately. Even the imports
+    happen here, since importing sklearn/rdflib already takes seconds.
+    """
+    finished = pyqtSignal(object)
+
+    def __init__(self, base_dir: Path):
+        super().__init__()
+        self.base_dir = base_dir
+
+    def run(self):
+        # An exception escaping a Qt slot aborts the process, and the UI
+        # would wait on "Loading components..." forever, so any load
+        # failure is reported through the signal instead of raised.
+        try:
+            sys.path.append(str(self.base_dir))
+            from main import load_components  # deferred heavy import
+            self.finished.emit(load_components(self.base_dir))
+        except Exception as e:
+            self.finished.emit(e)
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -107,6 +133,35 @@ class MainWindow(QMainWindow):
 
         self.setCentralWidget(central)
 
+        # Kick off component loading in the background; input stays disabled
+        # until everything is ready.
+        self.components = None
+        self.widgetTextbox.setEnabled(False)
+        self.widgetTextbox.setPlaceholderText("Loading components...")
+
+        self._loader = QThread()
+        self._worker = LoaderWorker(BASE_DIR)
+        self._worker.moveToThread(self._loader)
+        self._loader.started.connect(self._worker.run)
+        self._worker.finished.connect(self._on_components_ready)
+        self._loader.start()
+
+    def _on_components_ready(self, components):
+        if isinstance(components, Exception):
+            # Degraded mode: the window stays usable so the error is
+            # visible, but no diagnosis can run without components.
+            self.components = None
+            self.widgetTextbox.setEnabled(True)
+            self.widgetTextbox.setPlaceholderText(
+                "Component loading failed - diagnosis unavailable"
+            )
+            self.textboxMiddle.setPlainText(f"Failed to load components: {components}")
+        else:
+            self.components = components
+            self.widgetTextbox.setEnabled(True)
+            self.widgetTextbox.setPlaceholderText("Enter your text")
+        self._loader.quit()
+
     def show_state(self, s):
         print(s == Qt.CheckState.Checked.value)
         print(s)
@@ -1,6 +1,7 @@
 import os
 import json
 import re
+import ahocorasick
 import pandas as pd
 from collections import defaultdict
 
@@ -15,9 +16,19 @@ def normalize(text: str) -> str:
     return re.sub(r"[^a-z ]", "", text.lower())
 
 
-def extract_symptoms(text: str, vocabulary: list[str]) -> set[str]:
+def build_symptom_automaton(vocabulary: list[str]) -> ahocorasick.Automaton:
+    """One automaton over the whole vocabulary: finding all symptom hits in a
+    text is a single linear scan instead of one substring search per term."""
+    automaton = ahocorasick.Automaton()
+    for s in vocabulary:
+        automaton.add_word(s, s)
+    automaton.make_automaton()
+    return automaton
+
+
+def extract_symptoms(text: str, automaton: ahocorasick.Automaton) -> set[str]:
     text = normalize(text)
-    return {s for s in vocabulary if s in text}
+    return {s for _, s in automaton.iter(text)}
 
 
 def sentence_join(items: list[str]) -> str:
@@ -34,13 +45,14 @@ def main():
     with open(SYMPTOM_PATH) as f:
         symptom_vocab = json.load(f)
 
+    automaton = build_symptom_automaton(symptom_vocab)
+
     disease_symptoms = defaultdict(set)
 
     # Aggregate symptoms per disease
-    for _, row in df.iterrows():
-        disease = row["label"].strip()
-        symptoms = extract_symptoms(row["text"], symptom_vocab)
-        disease_symptoms[disease].update(symptoms)
+    for disease, text in zip(df["label"].to_numpy(), df["text"].to_numpy()):
+        symptoms = extract_symptoms(text, automaton)
+        disease_symptoms[disease.strip()].update(symptoms)
 
     # Generate ONE file per disease
     for disease, symptoms in disease_symptoms.items():
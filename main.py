@@ -1,8 +1,15 @@
+import ahocorasick
 import joblib
+import re
 import sys
 from pathlib import Path
 from typing import List, Dict, Any
 
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
 
 base_dir = Path(__file__).parent.resolve()
 sys.path.append(str(base_dir))
@@ -14,42 +21,107 @@ from rag.rag_engine import RAGExplainer
 
 # Common symptoms loaded dynamically from the KG
 
-def extract_symptoms_from_text(text: str, known_symptoms: List[str]) -> List[str]:
+class SymptomExtractor:
     """
-    Extract symptom keywords from user text.
-    Simple keyword matching.
+    Compiles the KG symptom phrases (and the hand-written colloquial
+    synonyms) into one Aho-Corasick automaton at load time, so each user
+    query is a single linear scan with greedy longest-match overlap
+    resolution (so "chest pain" wins over "pain" on the same span).
     """
-    text_lower = text.lower()
-    found_symptoms = []
-    
-    # Check for multi-word symptom
-    # Sort by length to match longest phrases first (e.g. "chest pain" before "pain")
-    if not known_symptoms:
-        return []
-
-    for symptom in sorted(known_symptoms, key=len, reverse=True):
-        if symptom in text_lower:
-            found_symptoms.append(symptom)
-            text_lower = text_lower.replace(symptom, "", 1)
-    
-    # common phrases
-    synonyms = {
+
+    # common phrases -> canonical symptom
+    SYNONYMS = {
         "loose stool": "diarrhea",
         "stomach ache": "abdominal pain",
-        "tummy ache": "abdominal pain", 
+        "tummy ache": "abdominal pain",
         "high temp": "fever",
         "throwing up": "vomiting",
         "shitting": "diarrhea"
     }
-    
-    for phrase, symptom in synonyms.items():
-        if phrase in text_lower and symptom not in found_symptoms:
-            found_symptoms.append(symptom)
-            
-    return list(set(found_symptoms))
+
+    # Below this, automaton construction/scan overhead beats Hyperscan's
+    # pattern compilation; above it, the JIT'd DFA wins on long texts.
+    HYPERSCAN_MIN_VOCAB = 500
+
+    def __init__(self, phrases: List[str]):
+        # (phrase, canonical symptom) pairs; synonym phrases map to their
+        # canonical symptom so they cost nothing extra at query time.
+        entries = [
+            (phrase, phrase) for phrase in sorted({p.lower() for p in phrases})
+        ] + list(self.SYNONYMS.items())
+
+        self._db = None
+        if hyperscan is not None and len(entries) >= self.HYPERSCAN_MIN_VOCAB:
+            # Hyperscan compiles all phrases into one vectorized DFA;
+            # worthwhile once the KG vocabulary grows into the hundreds.
+            self._symbols = [symptom for _, symptom in entries]
+            self._db = hyperscan.Database()
+            self._db.compile(
+                expressions=[re.escape(p).encode() for p, _ in entries],
+                ids=list(range(len(entries))),
+                flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SOM_LEFTMOST]
+                * len(entries),
+            )
+        else:
+            self.automaton = ahocorasick.Automaton()
+            # Values carry the matched word's length, since synonym phrases
+            # map to a canonical symptom with a different length.
+            for phrase, symptom in entries:
+                self.automaton.add_word(phrase, (len(phrase), symptom))
+            self.automaton.make_automaton()
+
+    def _scan(self, text_lower: str) -> List[tuple]:
+        """All vocabulary hits in a single pass: (start, end, symptom)."""
+        if self._db is not None:
+            matches: List[tuple] = []
+            self._db.scan(
+                text_lower.encode(),
+                match_event_handler=lambda id_, start, end, flags, ctx: matches.append(
+                    (start, end - 1, self._symbols[id_])
+                ),
+            )
+            return matches
+        return [
+            (end - length + 1, end, symptom)
+            for end, (length, symptom) in self.automaton.iter(text_lower)
+        ]
+
+    def extract(self, text: str) -> List[str]:
+        text_lower = text.lower()
+        found_symptoms = []
+
+        matches = self._scan(text_lower)
+
+        # Prefer the longest phrases, then drop anything overlapping a claimed span
+        matches.sort(key=lambda m: (-(m[1] - m[0]), m[0]))
+        claimed: List[tuple] = []
+        for start, end, symptom in matches:
+            if any(start <= c_end and end >= c_start for c_start, c_end in claimed):
+                continue
+            claimed.append((start, end))
+            if symptom not in found_symptoms:
+                found_symptoms.append(symptom)
+
+        return list(set(found_symptoms))
 
 from reasoning.wikidata_client import WikidataClient
 
+def classify_texts(classifier, texts: List[str]) -> List[Dict[str, Any]]:
+    """
+    Batch classification: one TF-IDF transform + predict_proba call for all
+    texts, so callers (e.g. the UI) can coalesce several queries at once.
+    """
+    probs = classifier.predict_proba(texts)
+    labels = classifier.classes_
+    results = []
+    for row in probs:
+        top_idx = row.argmax()
+        results.append({
+            "disease_id": labels[top_idx],
+            "score": float(row[top_idx])
+        })
+    return results
+
 def load_components(base_path: Path):
     """Load all models and data."""
     print("Loading components...", file=sys.stderr)
@@ -62,6 +134,12 @@ def load_components(base_path: Path):
 
     try:
         components['classifier'] = joblib.load(model_path)
+        # Freeze the TF-IDF analyzer: build_analyzer() compiles the token
+        # regex + preprocessing closure once here instead of rebuilding it
+        # inside every transform call on the query path.
+        tfidf = components['classifier'].named_steps.get("tfidf")
+        if tfidf is not None:
+            tfidf.analyzer = tfidf.build_analyzer()
     except Exception as e:
         print(f"Warning: Could not load classifier: {e}", file=sys.stderr)
         components['classifier'] = None
@@ -106,6 +184,12 @@ def load_components(base_path: Path):
     else:
         components['all_symptoms'] = []
 
+    # Compile the matcher once; queries reuse it
+    if components['all_symptoms']:
+        components['symptom_extractor'] = SymptomExtractor(components['all_symptoms'])
+    else:
+        components['symptom_extractor'] = None
+
     return components
 
 def run_diagnosis(text: str, components: Dict[str, Any]):
@@ -117,11 +201,12 @@ def run_diagnosis(text: str, components: Dict[str, Any]):
     print(f"Input: {text}")
     
     # 1. Extract Symptoms
-    known_symptoms = components.get('all_symptoms', [])
-    if not known_symptoms:
+    extractor = components.get('symptom_extractor')
+    if extractor is None:
         print("Warning: No known symptoms loaded from Knowledge Graph. Extraction may fail.")
-    
-    symptoms = extract_symptoms_from_text(text, known_symptoms)
+        symptoms = []
+    else:
+        symptoms = extractor.extract(text)
     print(f"Extracted Symptoms: {', '.join(symptoms) if symptoms else 'None found'}\n")
     
     if not symptoms:
@@ -158,14 +243,8 @@ def run_diagnosis(text: str, components: Dict[str, Any]):
     if classifier and reasoner:
         try:
             # Get raw ML prediction
-            probs = classifier.predict_proba([text])[0]
-            labels = classifier.classes_
-            top_idx = probs.argmax()
-            ml_prediction = {
-                "disease_id": labels[top_idx], 
-                "score": float(probs[top_idx])
-            }
-            
+            ml_prediction = classify_texts(classifier, [text])[0]
+
             # Fuse results
             final_result = reasoner.fuse_results(
                 ml_prediction=ml_prediction,
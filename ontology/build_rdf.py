@@ -1,70 +1,85 @@
-import pandas as pd
-import re
-from rdflib import Graph, Namespace, Literal, RDF
-
-# ---------- CONFIG ----------
-CSV_PATH = "data/symptom2disease.csv"
-OUTPUT_TTL = "ontology/knowledge.ttl"
-
-BASE_URI = "http://uu.nl/medical/"
-EX = Namespace(BASE_URI)
-
-# Very simple symptom extractor (v1 – replace later)
-KNOWN_SYMPTOMS = [
-    "fever", "headache", "nausea", "vomiting", "cough",
-    "fatigue", "diarrhea", "pain", "sore throat"
-]
-# ----------------------------
-
-
-def normalize(text):
-    return re.sub(r"[^a-zA-Z ]", "", text.lower())
-
-
-def extract_symptoms(text):
-    text = normalize(text)
-    return [s for s in KNOWN_SYMPTOMS if s in text]
-
-
-def uriify(name):
-    return name.replace(" ", "").replace("-", "")
-
-
-def main():
-    df = pd.read_csv(CSV_PATH)
-
-    g = Graph()
-    g.bind("ex", EX)
-
-    for _, row in df.iterrows():
-        disease_name = row["label"].strip()
-        text = row["text"]
-
-        disease_uri = EX[uriify(disease_name)]
-        g.add((disease_uri, RDF.type, EX.Disease))
-
-        symptoms = extract_symptoms(text)
-
-        for symptom in symptoms:
-            symptom_uri = EX[uriify(symptom)]
-            g.add((symptom_uri, RDF.type, EX.Symptom))
-            g.add((disease_uri, EX.hasSymptom, symptom_uri))
-
-        if symptoms:
-            explanation = (
-                f"{disease_name} is commonly associated with "
-                + ", ".join(symptoms)
-                + "."
-            )
-            g.add((
-                disease_uri,
-                EX.hasExplanation,
-                Literal(explanation)
-            ))
-
-    g.serialize(destination=OUTPUT_TTL, format="turtle")
-    print(f"RDF knowledge graph written to {OUTPUT_TTL}")
-
-
-if __name__ == "__main__":
-    main()
+import ahocorasick
+import polars as pl
+from rdflib import Namespace, Literal, RDF
+
+from graph_cache import new_graph
+
+# ---------- CONFIG ----------
+CSV_PATH = "data/symptom2disease.csv"
+OUTPUT_TTL = "ontology/knowledge.ttl"
+
+BASE_URI = "http://uu.nl/medical/"
+EX = Namespace(BASE_URI)
+
+# Very simple symptom extractor (v1 – replace later)
+KNOWN_SYMPTOMS = [
+    "fever", "headache", "nausea", "vomiting", "cough",
+    "fatigue", "diarrhea", "pain", "sore throat"
+]
+# ----------------------------
+
+
+def build_symptom_automaton():
+    # One automaton scan per row finds every known symptom in a single
+    # pass over the text, instead of one substring check per symptom.
+    automaton = ahocorasick.Automaton()
+    for symptom in KNOWN_SYMPTOMS:
+        automaton.add_word(symptom, symptom)
+    automaton.make_automaton()
+    return automaton
+
+
+def uriify(name):
+    return name.replace(" ", "").replace("-", "")
+
+
+def iter_triples(df, automaton):
+    """Yield quads for g.addN, one batch call instead of per-triple g.add."""
+    # Vectorized normalization: Polars' Rust string kernels do the whole
+    # column at once rather than re.sub per row.
+    norm = df["text"].str.to_lowercase().str.replace_all(r"[^a-z ]", "")
+
+    for disease_name, text in zip(df["label"], norm):
+        disease_name = disease_name.strip()
+        disease_uri = EX[uriify(disease_name)]
+        yield (disease_uri, RDF.type, EX.Disease, None)
+
+        symptoms = sorted({v for _, v in automaton.iter(text)})
+
+        for symptom in symptoms:
+            symptom_uri = EX[uriify(symptom)]
+            yield (symptom_uri, RDF.type, EX.Symptom, None)
+            yield (disease_uri, EX.hasSymptom, symptom_uri, None)
+
+        if symptoms:
+            explanation = (
+                f"{disease_name} is commonly associated with "
+                + ", ".join(symptoms)
+                + "."
+            )
+            yield (disease_uri, EX.hasExplanation, Literal(explanation), None)
+
+
+def main():
+    # Oxigraph-backed when available: rdflib's own turtle serializer does
+    # per-triple qname work that scales badly, the Rust store does not.
+    g = new_graph()
+    g.bind("ex", EX)
+
+    automaton = build_symptom_automaton()
+
+    # Batched read keeps memory flat however large the CSV grows; each
+    # batch is normalized column-wise and streamed straight into addN.
+    reader = pl.read_csv_batched(CSV_PATH, batch_size=50_000)
+    while (batches := reader.next_batches(4)) is not None:
+        for df in batches:
+            g.addN(
+                (s, p, o, g) for s, p, o, _ in iter_triples(df, automaton)
+            )
+
+    g.serialize(destination=OUTPUT_TTL, format="turtle")
+    print(f"RDF knowledge graph written to {OUTPUT_TTL}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Process-wide cache for parsed rdflib graphs.
+
+Parsing a TTL with rdflib takes seconds and ~100MB, and both the
+RDFDiseaseFinder and the MedlineGen loader may need the same ontology in one
+process (e.g. when driven from the UI). Caching the parsed Graph per path
+makes that a one-time cost.
+
+When oxrdflib is installed the graph is backed by an Oxigraph store: the
+Turtle is parsed by Rust (10-30x faster than rdflib's pure-Python parser)
+and triples are stored far more compactly, while the rdflib Graph API that
+the rest of the code uses stays identical.
+"""
+
+from functools import lru_cache
+
+from rdflib import Graph
+
+try:
+    import oxrdflib  # noqa: F401  (registers the "Oxigraph" store plugin)
+    _STORE = "Oxigraph"
+except ImportError:
+    _STORE = "default"
+
+
+def new_graph() -> Graph:
+    """Empty graph on the fastest available store (Oxigraph if installed)."""
+    return Graph(store=_STORE)
+
+
+@lru_cache(maxsize=4)
+def load_graph(path_str: str) -> Graph:
+    g = new_graph()
+    g.parse(path_str, format="turtle")
+    return g
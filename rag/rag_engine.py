@@ -1,7 +1,13 @@
+import hashlib
+import json
 import os
+from pathlib import Path
 from urllib import response
 import faiss
 import requests
+import torch
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from sentence_transformers import SentenceTransformer
 
 
@@ -15,45 +21,151 @@ class RAGExplainer:
     NEVER predicts diseases.
     """
 
-    def __init__(self, docs_path="KnowledgeAndDataEngineering-main/rag/docs"):
-        self.embedder = SentenceTransformer("all-MiniLM-L6-v2")
+    def __init__(
+        self,
+        docs_path="KnowledgeAndDataEngineering-main/rag/docs",
+        batch_size=64,
+        device=None,
+        use_fp16=True,
+        backend="torch",
+        model_kwargs=None,
+    ):
+        # Encode on the GPU when one is present; FP16 there halves
+        # bandwidth and uses tensor cores with no measurable retrieval
+        # loss for MiniLM.
+        if device is None:
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        # backend="onnx" runs MiniLM through ONNX Runtime; pass
+        # model_kwargs={"file_name": "onnx/model_qint8_avx512_vnni.onnx"}
+        # to pick a dynamically int8-quantized export, ~2-3x faster on CPU
+        # with no measurable retrieval loss for this model.
+        self.embedder = SentenceTransformer(
+            "all-MiniLM-L6-v2",
+            device=device,
+            backend=backend,
+            model_kwargs=model_kwargs or {},
+        )
+        self.batch_size = batch_size
+        if use_fp16 and device.startswith("cuda"):
+            self.embedder.half()
         self.docs = []
         self._load_docs(docs_path)
-        self._build_index()
+        self._load_or_build_index(docs_path)
+        # Keep-alive session for the local Ollama server: one pooled TCP
+        # connection across explain() calls instead of a new one each time.
+        self.session = requests.Session()
+        self.session.mount(
+            "http://",
+            HTTPAdapter(
+                pool_connections=10,
+                pool_maxsize=10,
+                max_retries=Retry(total=3, backoff_factor=0.2),
+            ),
+        )
 
     def _load_docs(self, path):
-        for fname in os.listdir(path):
+        for fname in sorted(os.listdir(path)):
             with open(os.path.join(path, fname), "r", encoding="utf-8") as f:
                 self.docs.append(f.read())
 
+    def _docs_fingerprint(self, path):
+        # Name + size + mtime per file is enough to detect edits without
+        # re-reading contents.
+        h = hashlib.sha1()
+        for fname in sorted(os.listdir(path)):
+            st = os.stat(os.path.join(path, fname))
+            h.update(f"{fname}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+        return h.hexdigest()
+
+    def _load_or_build_index(self, docs_path):
+        # Re-encoding every doc dominates cold start; cache the built
+        # index keyed by a fingerprint of the docs directory.
+        cache_dir = Path(docs_path).parent / ".rag_index_cache"
+        fp = self._docs_fingerprint(docs_path)
+        index_path = cache_dir / f"{fp}.faiss"
+        ids_path = cache_dir / f"{fp}.ids.json"
+
+        if index_path.exists() and ids_path.exists():
+            self.index = faiss.read_index(str(index_path))
+            self.doc_ids = json.loads(ids_path.read_text(encoding="utf-8"))
+            return
+
+        self._build_index()
+        cache_dir.mkdir(exist_ok=True)
+        # Each docs edit changes the fingerprint, so stale entries would
+        # pile up forever; only the current fingerprint is worth keeping.
+        for old in cache_dir.iterdir():
+            if old.name.split(".", 1)[0] != fp:
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
+        faiss.write_index(self.index, str(index_path))
+        ids_path.write_text(json.dumps(self.doc_ids), encoding="utf-8")
+
+    def _encode(self, texts):
+        # Normalized embeddings + inner-product index = cosine similarity,
+        # with the transformer forward pass batched instead of per-text.
+        return self.embedder.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+
     def _build_index(self):
-        embeddings = self.embedder.encode(self.docs)
-        self.index = faiss.IndexFlatL2(embeddings.shape[1])
+        # Encode docs sorted by length so each batch pads to a similar
+        # length; a permutation array maps FAISS ids back to doc ids.
+        order = sorted(range(len(self.docs)), key=lambda i: len(self.docs[i]))
+        embeddings = self._encode([self.docs[i] for i in order])
+        self.doc_ids = order
+        # HNSW graph: ~O(log N) per query instead of a full flat scan,
+        # which matters once rag/docs grows past a few thousand files.
+        self.index = faiss.IndexHNSWFlat(
+            embeddings.shape[1], 32, faiss.METRIC_INNER_PRODUCT
+        )
+        self.index.hnsw.efConstruction = 100
         self.index.add(embeddings)
+        self.index.hnsw.efSearch = 64
 
-    def _retrieve(self, query, k=3):
-        q_emb = self.embedder.encode([query])
-        _, idxs = self.index.search(q_emb, k)       
-        return [self.docs[i] for i in idxs[0]]
+    def _retrieve(self, query, k=3, ef_search=None):
+        if ef_search is not None:
+            # runtime recall/latency knob; no rebuild needed
+            self.index.hnsw.efSearch = ef_search
+        q_emb = self._encode([query])
+        _, idxs = self.index.search(q_emb, k)
+        return [self.docs[self.doc_ids[i]] for i in idxs[0]]
 
     def _call_ollama(self, prompt: str) -> str:
-        response = requests.post(
-        "http://localhost:11434/api/chat",
-        json={
-            "model": OLLAMA_MODEL,
-            "messages": [
-                {"role": "system", "content": "You are a medical explanation assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            "stream": False,
-            "options": {
-                "temperature": 0.2
-            }
-        },
-        timeout=60
-    )
+        # Streamed so tokens arrive as generated rather than after the
+        # whole completion is done.
+        response = self.session.post(
+            "http://localhost:11434/api/chat",
+            json={
+                "model": OLLAMA_MODEL,
+                "messages": [
+                    {"role": "system", "content": "You are a medical explanation assistant."},
+                    {"role": "user", "content": prompt}
+                ],
+                "stream": True,
+                "options": {
+                    "temperature": 0.2
+                }
+            },
+            stream=True,
+            timeout=60
+        )
         response.raise_for_status()
-        return response.json()["message"]["content"]
+        parts = []
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            parts.append(chunk.get("message", {}).get("content", ""))
+            if chunk.get("done"):
+                break
+        return "".join(parts)
 
     def explain(self, symptoms, disease, confidence):
         """
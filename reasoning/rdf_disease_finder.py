@@ -4,26 +4,43 @@ Supports symptom-role aware querying and similarity scoring.
 """
 
 import re
+import sys
 from pathlib import Path
 from typing import List, Dict, Optional, Set
 from collections import defaultdict
 
+import ahocorasick
+import numpy as np
 from rdflib import Graph, Namespace, RDF, OWL, URIRef
 from rdflib.namespace import SKOS, RDFS
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from ontology.graph_cache import load_graph
+
+# Compiled once; normalize runs O(symptoms x diseases) in hot paths
+_HYPHEN = re.compile(r"[-_]+")
+
 
 class RDFDiseaseFinder:
     def __init__(self, rdf_path: str):
-        self.graph = Graph()
-        self.graph.parse(rdf_path, format="turtle")
+        # Shared cache: parsing the same TTL twice in one process is free
+        self.graph = load_graph(str(rdf_path))
 
         # Hard-bind namespace (stop guessing)
         self.EX = Namespace("http://uu.nl/medical/")
         self.graph.bind("ex", self.EX)
 
-        # Caches
+        # Caches: fill both label caches in one pass over the label
+        # predicates, so _get_label is a dict hit instead of a per-URI
+        # graph walk on the hot scoring path. prefLabel wins over
+        # rdfs:label, matching the old per-call lookup order.
         self._symptom_label_cache: Dict[str, str] = {}
-        self._disease_label_cache: Dict[str, str] = {}
+        for p in (SKOS.prefLabel, RDFS.label):
+            for s, _, o in self.graph.triples((None, p, None)):
+                if not getattr(o, "language", None) or o.language == "en":
+                    self._symptom_label_cache.setdefault(str(s), str(o))
+        self._disease_label_cache: Dict[str, str] = dict(self._symptom_label_cache)
 
         # Sanity checks (fail fast)
         if not any(self.graph.triples((None, RDF.type, self.EX.Disease))):
@@ -32,13 +49,56 @@ class RDFDiseaseFinder:
         # Cache content
         self._disease_symptoms_cache = self.get_all_disease_symptoms()
 
+        # SoA bitmatrix for similarity scoring: one row per disease, one
+        # column per symptom. Jaccard over all diseases then becomes a
+        # single matrix-vector product instead of per-disease set ops.
+        all_symptoms = sorted(
+            {s for ds in self._disease_symptoms_cache.values() for s in ds},
+            key=str,
+        )
+        self.sym_id: Dict[URIRef, int] = {s: i for i, s in enumerate(all_symptoms)}
+        self.disease_ids: List[URIRef] = sorted(self._disease_symptoms_cache, key=str)
+        # Stored in the matmul dtype up front: casting per query would
+        # re-materialize the whole matrix on every call.
+        self.M = np.zeros((len(self.disease_ids), len(self.sym_id)), dtype=np.int64)
+        for d_idx, disease in enumerate(self.disease_ids):
+            for symptom in self._disease_symptoms_cache[disease]:
+                self.M[d_idx, self.sym_id[symptom]] = 1
+        self.row_pop = self.M.sum(axis=1)
+
+        # Normalized label -> URIs lookup plus an automaton over the labels,
+        # built once so find_symptom_uris never walks the graph per call.
+        # Distinct symptoms can normalize to the same label, so each entry
+        # carries every URI for that label.
+        self._label_to_uris: Dict[str, Set[URIRef]] = defaultdict(set)
+        symptom_types = {self.EX.Symptom}
+        for subclass in self.graph.subjects(RDFS.subClassOf, self.EX.Symptom):
+            symptom_types.add(subclass)
+        for symptom_type in symptom_types:
+            for symptom in self.graph.subjects(RDF.type, symptom_type):
+                label = self.normalize(self.get_symptom_label(symptom))
+                self._label_to_uris[label].add(symptom)
+        self._label_to_uris = dict(self._label_to_uris)
+        self._label_automaton = ahocorasick.Automaton()
+        for label, uris in self._label_to_uris.items():
+            self._label_automaton.add_word(label, uris)
+        self._label_automaton.make_automaton()
+
+        # Disease lookup by normalized label: the introspection helpers
+        # (called per prediction from fuse_results) become dict hits
+        # instead of scans over every ex:Disease.
+        self._disease_by_normlabel: Dict[str, URIRef] = {}
+        for disease in self.graph.subjects(RDF.type, self.EX.Disease):
+            label = self.normalize(self.get_disease_label(disease))
+            self._disease_by_normlabel.setdefault(label, disease)
+
     # ------------------------------------------------------------------
     # Normalization
     # ------------------------------------------------------------------
 
     @staticmethod
     def normalize(text: str) -> str:
-        return re.sub(r"[-_]+", " ", text.lower().strip())
+        return _HYPHEN.sub(" ", text.lower().strip())
 
     # ------------------------------------------------------------------
     # Labels
@@ -49,13 +109,7 @@ class RDFDiseaseFinder:
         if uri_str in cache:
             return cache[uri_str]
 
-        for p in (SKOS.prefLabel, RDFS.label):
-            for label in self.graph.objects(uri, p):
-                if not label.language or label.language == "en":
-                    cache[uri_str] = str(label)
-                    return cache[uri_str]
-
-        # Fallback: local name
+        # Miss means the URI had no English label at all: local name
         cache[uri_str] = uri_str.split("/")[-1]
         return cache[uri_str]
 
@@ -72,19 +126,21 @@ class RDFDiseaseFinder:
     def find_symptom_uris(self, symptom_labels: List[str]) -> Set[URIRef]:
         normalized_inputs = {self.normalize(s) for s in symptom_labels}
         matches: Set[URIRef] = set()
-
-        # Get all symptom subclasses (e.g., ex:SystemicSymptom, ex:SkinSymptom, etc.)
-        symptom_types = {self.EX.Symptom}
-        for subclass in self.graph.subjects(RDFS.subClassOf, self.EX.Symptom):
-            symptom_types.add(subclass)
-
-        # Find symptoms of any symptom type
-        for symptom_type in symptom_types:
-            for symptom in self.graph.subjects(RDF.type, symptom_type):
-                label = self.normalize(self.get_symptom_label(symptom))
-                for s in normalized_inputs:
-                    if s == label or s in label or label in s:
-                        matches.add(symptom)
+        if not normalized_inputs:
+            return matches
+
+        # Both containment directions run over every input, matching the
+        # old s == label / s in label / label in s scan (equality is the
+        # degenerate case of either containment).
+        # label-contained-in-input: one automaton pass over the inputs
+        for _, uris in self._label_automaton.iter(" | ".join(normalized_inputs)):
+            matches.update(uris)
+        # input-contained-in-label: linear scan over cached labels only
+        for label, uris in self._label_to_uris.items():
+            if matches.issuperset(uris):
+                continue
+            if any(s in label for s in normalized_inputs):
+                matches.update(uris)
 
         return matches
 
@@ -123,32 +179,55 @@ class RDFDiseaseFinder:
         if not input_symptoms:
             return []
 
-        # Use cached index
-        disease_symptoms = self._disease_symptoms_cache
-        results = []
-
-        for disease, ds in disease_symptoms.items():
-            intersection = input_symptoms & ds
-            if not intersection:
-                continue
+        # Vectorized scoring over the precomputed bitmatrix: intersection
+        # counts for every disease come from one M @ q, unions from the
+        # cached row popcounts.
+        q = np.zeros(len(self.sym_id), dtype=np.int64)
+        known_inputs = [s for s in input_symptoms if s in self.sym_id]
+        q[[self.sym_id[s] for s in known_inputs]] = 1
+
+        inter = self.M @ q
+        n_input = len(input_symptoms)
+        if use_jaccard:
+            # union counts only symptoms attached to some disease plus the
+            # unknown inputs, matching the old set arithmetic
+            union = self.row_pop + n_input - inter
+            scores = np.divide(inter, union, out=np.zeros(len(inter)), where=union > 0)
+        else:
+            scores = inter / n_input
+
+        candidates = np.flatnonzero(inter > 0)
+        if candidates.size == 0:
+            return []
 
-            union = input_symptoms | ds
-            score = (
-                len(intersection) / len(union)
-                if use_jaccard and union
-                else len(intersection) / len(input_symptoms)
-            )
+        # Partial selection: keep every candidate scoring at least the
+        # k-th best, so ties at the boundary survive to the deterministic
+        # sort below instead of being cut in argpartition's arbitrary
+        # order. The dict building and sort then run over k plus any ties
+        # rather than all diseases.
+        if top_k and top_k < candidates.size:
+            part = np.argpartition(-scores[candidates], top_k - 1)
+            kth_score = scores[candidates[part[top_k - 1]]]
+            candidates = candidates[scores[candidates] >= kth_score]
 
+        results = []
+        for d_idx in candidates:
+            disease = self.disease_ids[d_idx]
+            ds = self._disease_symptoms_cache[disease]
+            intersection = input_symptoms & ds
             results.append({
                 "disease_uri": disease,
                 "disease_name": self.get_disease_label(disease),
                 "matched_symptoms": sorted(self.get_symptom_label(s) for s in intersection),
-                "match_count": len(intersection),
-                "similarity_score": score,
+                "match_count": int(inter[d_idx]),
+                "similarity_score": float(scores[d_idx]),
                 "total_disease_symptoms": len(ds),
-                "total_input_symptoms": len(input_symptoms),
+                "total_input_symptoms": n_input,
             })
 
+        # Only ever sorting k-plus-ties (or all candidates, when top_k is
+        # None) dicts; the truncation happens after this deterministic
+        # ordering so boundary ties resolve the same way on every call.
         results.sort(
             key=lambda r: (-r["similarity_score"], -r["match_count"], r["disease_name"])
         )
@@ -159,57 +238,61 @@ class RDFDiseaseFinder:
     # Introspection helpers
     # ------------------------------------------------------------------
 
-    def get_disease_symptoms(self, disease_name: str) -> List[str]:
+    def _find_disease(self, disease_name: str, partial: bool = False) -> Optional[URIRef]:
         target = self.normalize(disease_name)
-
-        for disease in self.graph.subjects(RDF.type, self.EX.Disease):
-            label = self.normalize(self.get_disease_label(disease))
+        disease = self._disease_by_normlabel.get(target)
+        if disease is not None or not partial:
+            return disease
+        # Partial match falls back to scanning the (small) label dict only
+        for label, uri in self._disease_by_normlabel.items():
             if target in label:
-                symptoms = set()
-                for prop in (
-                    self.EX.hasPrimarySymptom,
-                    self.EX.hasSecondarySymptom,
-                    self.EX.hasComplication,
-                ):
-                    for s in self.graph.objects(disease, prop):
-                        symptoms.add(self.get_symptom_label(s))
-                return sorted(symptoms)
-
-        return []
+                return uri
+        return None
+
+    def get_disease_symptoms(self, disease_name: str) -> List[str]:
+        disease = self._find_disease(disease_name, partial=True)
+        if disease is None:
+            return []
+
+        symptoms = set()
+        for prop in (
+            self.EX.hasPrimarySymptom,
+            self.EX.hasSecondarySymptom,
+            self.EX.hasComplication,
+        ):
+            for s in self.graph.objects(disease, prop):
+                symptoms.add(self.get_symptom_label(s))
+        return sorted(symptoms)
 
     def get_primary_symptoms(self, disease_name: str) -> List[str]:
         """
         Get only the primary symptoms for a specific disease.
         Used for validation/sanity checks.
         """
-        target = self.normalize(disease_name)
-        
-        for disease in self.graph.subjects(RDF.type, self.EX.Disease):
-            label = self.normalize(self.get_disease_label(disease))
-            if target == label: # Strict match for sanity check
-                symptoms = set()
-                for s in self.graph.objects(disease, self.EX.hasPrimarySymptom):
-                    symptoms.add(self.get_symptom_label(s))
-                return sorted(symptoms)
-        return []
+        disease = self._find_disease(disease_name)  # strict match for sanity check
+        if disease is None:
+            return []
+        return sorted(
+            self.get_symptom_label(s)
+            for s in self.graph.objects(disease, self.EX.hasPrimarySymptom)
+        )
 
     def get_wikidata_id(self, disease_name: str) -> Optional[str]:
         """
         Extract the Wikidata Q-ID for a given disease name from the ontology.
         Uses the owl:equivalentClass or owl:sameAs relationship.
         """
-        target = self.normalize(disease_name)
-        
-        for disease in self.graph.subjects(RDF.type, self.EX.Disease):
-            label = self.normalize(self.get_disease_label(disease))
-            if target == label:
-                # Look for owl:equivalentClass or owl:sameAs that points to wd namespace
-                for prop in (OWL.equivalentClass, OWL.sameAs):
-                    for eq in self.graph.objects(disease, prop):
-                        # Check if the URI starts with wikidata entity prefix
-                        s_eq = str(eq)
-                        if "wikidata.org/entity/" in s_eq:
-                            return s_eq.split("/")[-1]
+        disease = self._find_disease(disease_name)
+        if disease is None:
+            return None
+
+        # Look for owl:equivalentClass or owl:sameAs that points to wd namespace
+        for prop in (OWL.equivalentClass, OWL.sameAs):
+            for eq in self.graph.objects(disease, prop):
+                # Check if the URI starts with wikidata entity prefix
+                s_eq = str(eq)
+                if "wikidata.org/entity/" in s_eq:
+                    return s_eq.split("/")[-1]
         return None
 
     def get_all_symptoms(self) -> List[str]:
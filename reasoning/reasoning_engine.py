@@ -30,8 +30,9 @@ class ReasoningEngine:
             "reasoning": []
         }
         
-        # 1. Agreement Check
-        kg_agrees = any(d['disease_name'] == ml_prediction['disease_id'] for d in rdf_candidates)
+        # 1. Agreement Check (set membership instead of a linear scan)
+        kg_names = {d['disease_name'] for d in rdf_candidates}
+        kg_agrees = ml_prediction['disease_id'] in kg_names
         if kg_agrees:
             final_result['final_score'] = min(1.0, final_result['final_score'] + 0.2)
             final_result['reasoning'].append("Knowledge Graph agrees (Bonus +20%)")
@@ -42,13 +43,13 @@ class ReasoningEngine:
         # Only feasible if we have the RDF finder instance to query structure
         if rdf_finder:
             primary_symptoms = rdf_finder.get_primary_symptoms(ml_prediction['disease_id'])
-            # Normalize to check for intersection
-            user_sym_norm = [s.lower() for s in user_symptoms]
-            prim_sym_norm = [s.lower() for s in primary_symptoms]
-            
+            # Normalize once into frozensets; intersection happens at C level
+            user_set = frozenset(s.lower() for s in user_symptoms)
+            prim_set = frozenset(s.lower() for s in primary_symptoms)
+
             # If disease has primary symptoms defined, check if user has at least one
             if primary_symptoms:
-                has_primary = any(s in user_sym_norm for s in prim_sym_norm)
+                has_primary = not user_set.isdisjoint(prim_set)
                 if not has_primary:
                     final_result['final_score'] *= 0.5
                     final_result['reasoning'].append(
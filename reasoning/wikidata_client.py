@@ -1,18 +1,70 @@
-from typing import Optional, Dict
+from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import json
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 
 WIKIDATA_ENDPOINT = "https://query.wikidata.org/sparql"
 
+# Q-ID results change rarely; a day-old answer is fine for the UI
+CACHE_PATH = Path(__file__).resolve().parent / ".wd_cache.json"
+CACHE_TTL_SECONDS = 86400
+
 class WikidataClient:
     """
     Client for querying the Wikidata SPARQL endpoint.
     Retrieves live description, images, and links for diseases.
     """
-    
+
     def __init__(self, user_agent: str = "DiseasePredictor/1.0 (mailto:your-email@example.com)"):
         # Wikidata requires a User-Agent header
-        self.headers = {"User-Agent": user_agent}
+        self.headers = {"User-Agent": user_agent, "Accept-Encoding": "gzip"}
+        # Persistent session: keep-alive avoids a fresh TCP+TLS handshake
+        # per query, and transient endpoint errors get retried.
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount(
+            "https://",
+            HTTPAdapter(
+                pool_connections=10,
+                pool_maxsize=10,
+                max_retries=Retry(total=3, backoff_factor=0.2),
+            ),
+        )
+        # Wikidata asks for at most ~5 requests in flight per client
+        self._request_slots = threading.BoundedSemaphore(5)
+        self._cache_lock = threading.Lock()
+        self._cache = self._load_cache()
+
+    # ------------------------------------------------------------------
+    # Disk cache
+    # ------------------------------------------------------------------
+
+    def _load_cache(self) -> Dict[str, Dict]:
+        try:
+            return json.loads(CACHE_PATH.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _cache_get(self, wikidata_id: str) -> Optional[Dict[str, str]]:
+        entry = self._cache.get(wikidata_id)
+        if entry and time.time() - entry["fetched_at"] < CACHE_TTL_SECONDS:
+            return entry["info"]
+        return None
+
+    def _cache_put(self, wikidata_id: str, info: Optional[Dict[str, str]]) -> None:
+        with self._cache_lock:
+            self._cache[wikidata_id] = {"fetched_at": time.time(), "info": info}
+            try:
+                CACHE_PATH.write_text(
+                    json.dumps(self._cache), encoding="utf-8"
+                )
+            except OSError:
+                pass  # cache is best-effort
 
     def fetch_disease_info(self, wikidata_id: str) -> Optional[Dict[str, str]]:
         """
@@ -21,6 +73,10 @@ class WikidataClient:
         if not wikidata_id or not wikidata_id.startswith("Q"):
             return None
 
+        cached = self._cache_get(wikidata_id)
+        if cached is not None:
+            return cached
+
         query = f"""
         SELECT ?description ?image ?article WHERE {{
             wd:{wikidata_id} schema:description ?description .
@@ -35,15 +91,15 @@ class WikidataClient:
         """
 
         try:
-            response = requests.get(
-                WIKIDATA_ENDPOINT,
-                params={"query": query, "format": "json"},
-                headers=self.headers,
-                timeout=10
-            )
+            with self._request_slots:
+                response = self.session.get(
+                    WIKIDATA_ENDPOINT,
+                    params={"query": query, "format": "json"},
+                    timeout=10
+                )
             response.raise_for_status()
             data = response.json()
-            
+
             results = data.get("results", {}).get("bindings", [])
             if not results:
                 return None
@@ -54,9 +110,21 @@ class WikidataClient:
                 "image_url": result.get("image", {}).get("value"),
                 "wikipedia_url": result.get("article", {}).get("value")
             }
+            self._cache_put(wikidata_id, info)
             return info
 
         except Exception as e:
             # Silently fail for online queries to avoid crashing the main app
             print(f"Warning: Wikidata query failed: {e}")
             return None
+
+    def fetch_many(self, wikidata_ids: List[str]) -> Dict[str, Optional[Dict[str, str]]]:
+        """
+        Fetch several Q-IDs concurrently over the shared session. The
+        semaphore keeps at most 5 requests in flight, per Wikidata's
+        guidance; cached entries never hit the network.
+        """
+        ids = [q for q in dict.fromkeys(wikidata_ids) if q]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            infos = pool.map(self.fetch_disease_info, ids)
+        return dict(zip(ids, infos))
@@ -1,7 +1,7 @@
 from pathlib import Path
 import json
 import numpy as np
-import fasttext
+from model_loader import load_model_shared
 import faiss
 
 
@@ -15,24 +15,27 @@ OUT_JSON   = BASE_DIR / "faiss_subset" / "symptom_synonyms.json"
 
 
 # --------- helpers ----------
-def normalize_rows(x: np.ndarray) -> np.ndarray:
-    n = np.linalg.norm(x, axis=1, keepdims=True)
-    n[n == 0] = 1.0
-    return x / n
-
-
-def find_synonyms(model, index, words, term: str, k: int = 10):
-    q = np.array(model.get_sentence_vector(term), dtype="float32").reshape(1, -1)
-    q = normalize_rows(q)
-
-    D, I = index.search(q, k)
-    return [(words[i], float(D[0][j])) for j, i in enumerate(I[0])]
+def find_synonyms_batch(model, index, words, terms, k: int = 10):
+    """
+    One batched search for all terms: a single (N, d) embed + one
+    index.search call instead of N one-row searches, so FAISS can do
+    one big GEMM rather than N tiny ones.
+    """
+    Q = np.stack(
+        [model.get_sentence_vector(t) for t in terms]
+    ).astype("float32")
+    # FAISS's AVX in-place kernel: one pass, no temporary
+    faiss.normalize_L2(Q)
+
+    # k+1 so we can drop the self-match and still return k neighbours
+    D, I = index.search(Q, k + 1)
+    return D, I
 
 
 # --------- main ----------
 def main():
     print("Loading fastText model...")
-    model = fasttext.load_model(str(MODEL_PATH))
+    model = load_model_shared(MODEL_PATH)
 
     print("Loading FAISS index...")
     index = faiss.read_index(str(INDEX_PATH))
@@ -41,16 +44,15 @@ def main():
     words = json.loads(WORDS_PATH.read_text(encoding="utf-8"))
 
     print(f"Exporting synonyms for {len(words)} terms...")
-    symptom_to_synonyms = {}
+    D, I = find_synonyms_batch(model, index, words, words, k=10)
 
-    for term in words:
-        syns = find_synonyms(model, index, words, term, k=10)
-
-        # optional: remove self-match
-        syns = [(w, s) for (w, s) in syns if w != term]
-
-        # tuples -> lists (JSON-safe)
-        symptom_to_synonyms[term] = [[w, s] for (w, s) in syns]
+    symptom_to_synonyms = {}
+    for row, term in enumerate(words):
+        symptom_to_synonyms[term] = [
+            [words[i], float(D[row][j])]
+            for j, i in enumerate(I[row])
+            if words[i] != term
+        ][:10]
 
     print("Saving JSON...")
     OUT_JSON.write_text(
@@ -0,0 +1,214 @@
+from functools import lru_cache
+from pathlib import Path
+import json
+import numpy as np
+from model_loader import load_model_shared
+import faiss
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+if njit is not None:
+    @njit(fastmath=True, cache=True)
+    def _top2_ip(X, q):
+        """
+        Fused dot-product + best/second-best scan over the database
+        matrix. For the fixed d=700 BioSentVec vectors numba unrolls the
+        inner loop into FMA chains and the selection needs no heap.
+        """
+        b1 = -np.inf
+        b2 = -np.inf
+        i1 = 0
+        i2 = 0
+        for i in range(X.shape[0]):
+            s = 0.0
+            for j in range(X.shape[1]):
+                s += X[i, j] * q[j]
+            if s > b1:
+                b2 = b1
+                i2 = i1
+                b1 = s
+                i1 = i
+            elif s > b2:
+                b2 = s
+                i2 = i
+        return i1, b1, i2, b2
+else:
+    _top2_ip = None
+
+
+# --------- paths ----------
+BASE_DIR = Path(__file__).resolve().parent
+
+MODEL_PATH = BASE_DIR / "BioSentVec_PubMed_MIMICIII-bigram_d700.bin"
+INDEX_PATH = BASE_DIR / "faiss_subset" / "index.faiss"
+WORDS_PATH = BASE_DIR / "faiss_subset" / "words.json"
+
+
+# --------- helpers ----------
+# Fixed character mapping: translate is one C pass over a lookup table,
+# no regex engine involved. Punctuation becomes a space; split()/join
+# then collapses whitespace runs in a second C pass.
+_TR = str.maketrans({
+    c: " "
+    for c in map(chr, range(128))
+    if not (c.isalnum() or c in " \t\n-_")
+})
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.lower().translate(_TR).split())
+
+
+class SymptomCanonicalizer:
+    """
+    Maps free-text symptom phrases onto the canonical vocabulary behind
+    the FAISS subset index built by SynonymsGen. A phrase is accepted
+    when its nearest canonical term scores above accept_threshold and is
+    not ambiguous (best and runner-up closer than ambiguity_delta).
+    """
+
+    def __init__(
+        self,
+        model_path: Path = MODEL_PATH,
+        index_path: Path = INDEX_PATH,
+        words_path: Path = WORDS_PATH,
+        accept_threshold: float = 0.7,
+        ambiguity_delta: float = 0.05,
+    ):
+        self.model = load_model_shared(model_path)
+        # mmap: the index pages in on demand and the OS page cache shares
+        # it across canonicalizer processes instead of each one holding a
+        # private resident copy.
+        self.index = faiss.read_index(str(index_path), faiss.IO_FLAG_MMAP)
+        # FAISS does not multi-thread nq=1 searches and its per-query
+        # dispatch dominates at this index size; keep the raw matrix and
+        # let BLAS do the brute-force inner products instead.
+        self.X = self.index.reconstruct_n(0, self.index.ntotal)
+        # On a GPU box, batched searches run against HBM instead; only
+        # pays off together with the batched canonicalize_many path.
+        self._gpu_index = None
+        if faiss.get_num_gpus() > 0:
+            res = faiss.StandardGpuResources()
+            self._gpu_index = faiss.index_cpu_to_gpu(res, 0, self.index)
+        self.words = json.loads(Path(words_path).read_text(encoding="utf-8"))
+        self.accept_threshold = accept_threshold
+        self.ambiguity_delta = ambiguity_delta
+
+        # Per-instance embed cache: repeated phrases (common in
+        # interactive and validation runs) skip fastText subword hashing
+        # entirely. Defined as a closure so lru_cache never holds self.
+        @lru_cache(maxsize=8192)
+        def _embed_cached(phrase_norm: str) -> np.ndarray:
+            v = np.array(
+                self.model.get_sentence_vector(phrase_norm), dtype="float32"
+            )
+            n = np.linalg.norm(v)
+            if n:
+                v /= n
+            return v
+
+        self._embed_cached = _embed_cached
+        # Reused by canonicalize_one; skips a fresh (1, d) allocation per
+        # call in hot single-phrase loops.
+        self._q_buf = np.empty((1, self.index.d), dtype="float32")
+
+    def _embed(self, phrase_norm: str) -> np.ndarray:
+        # copy so callers can't mutate the cached row
+        return self._embed_cached(phrase_norm).copy()
+
+    def canonicalize_many(self, phrases: list[str], k: int = 2, return_scores: bool = False) -> list:
+        """
+        Batched canonicalization: one (N, d) embed + one index.search
+        call, then vectorized acceptance/ambiguity masks over the (N, k)
+        score matrix instead of a per-phrase search loop.
+
+        With return_scores=True each slot is a compact record
+        {"term", "accepted", "top_score"} instead of term-or-None, so
+        callers can see why a phrase was rejected without any extra
+        lookups.
+        """
+        normed = [normalize_text(p) for p in phrases]
+        nonempty = [i for i, p in enumerate(normed) if p]
+        results: list = [None] * len(phrases)
+        if not nonempty:
+            return results
+
+        # Rows come back unit-length from the cache, so no further
+        # normalization pass is needed here.
+        Q = np.stack([self._embed(normed[i]) for i in nonempty])
+
+        if self._gpu_index is not None:
+            D, I = self._gpu_index.search(Q, k)
+        else:
+            # One GEMM for all query/term scores, then a partial top-k per row
+            scores = Q @ self.X.T
+            I = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            D = np.take_along_axis(scores, I, axis=1)
+            order = np.argsort(-D, axis=1)
+            I = np.take_along_axis(I, order, axis=1)
+            D = np.take_along_axis(D, order, axis=1)
+
+        ambiguous = (D[:, 0] - D[:, 1]) < self.ambiguity_delta
+        accepted = (D[:, 0] >= self.accept_threshold) & ~ambiguous
+        for row, i in enumerate(nonempty):
+            if return_scores:
+                results[i] = {
+                    "term": self.words[I[row, 0]] if accepted[row] else None,
+                    "accepted": bool(accepted[row]),
+                    "top_score": float(D[row, 0]),
+                }
+            else:
+                results[i] = self._build_result(I[row], accepted[row])
+        return results
+
+    def _build_result(self, row_ids: np.ndarray, accepted: bool):
+        """Per-row decision, shared by the one-shot and batched paths."""
+        return self.words[row_ids[0]] if accepted else None
+
+    def canonicalize_one(self, phrase: str, k: int = 2):
+        """
+        Single-phrase fast path over the shared query buffer. Not
+        thread-safe because of that buffer; concurrent callers should use
+        canonicalize_many instead.
+        """
+        normed = normalize_text(phrase)
+        if not normed:
+            return None
+
+        np.copyto(self._q_buf[0], self._embed_cached(normed))
+        if self._gpu_index is not None:
+            D, I = self._gpu_index.search(self._q_buf, k)
+            top, d0, d1 = I[0, 0], D[0, 0], D[0, 1]
+        elif _top2_ip is not None and k == 2:
+            top, d0, _, d1 = _top2_ip(self.X, self._q_buf[0])
+        else:
+            # k=2 degenerates to best/second-best: two argmax scans beat
+            # the generic partition kernel, and scores is a fresh buffer
+            # so masking the winner in place is safe
+            scores = self.X @ self._q_buf[0]
+            top = int(np.argmax(scores))
+            d0 = float(scores[top])
+            scores[top] = -np.inf
+            d1 = float(scores[np.argmax(scores)])
+
+        accepted = (
+            d0 >= self.accept_threshold
+            and (d0 - d1) >= self.ambiguity_delta
+        )
+        return self._build_result(np.array([top]), accepted)
+
+
+# --------- main ----------
+def main():
+    canon = SymptomCanonicalizer()
+
+    samples = ["high temp", "splitting headache", "tummy ache", ""]
+    for phrase, result in zip(samples, canon.canonicalize_many(samples)):
+        print(f"{phrase!r} -> {result!r}")
+
+
+if __name__ == "__main__":
+    main()
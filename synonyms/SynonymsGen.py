@@ -1,7 +1,7 @@
 from pathlib import Path
 import json
 import numpy as np
-import fasttext
+from model_loader import load_model_shared
 import faiss
 
 
@@ -17,20 +17,59 @@ WORDS_PATH = OUT_DIR / "words.json"
 
 # --------- helpers ----------
 def read_candidates(path: Path) -> list[str]:
-    terms = []
-    seen = set()
-    for line in path.read_text(encoding="utf-8").splitlines():
-        t = line.strip()
-        if t and t not in seen:
-            seen.add(t)
-            terms.append(t)
-    return terms
+    # dict.fromkeys dedupes in one C-level insertion per line while
+    # keeping first-seen order, instead of a set lookup plus list append
+    return list(dict.fromkeys(
+        t for t in (
+            line.strip()
+            for line in path.read_text(encoding="utf-8").splitlines()
+        ) if t
+    ))
 
 
-def normalize_rows(x: np.ndarray) -> np.ndarray:
-    n = np.linalg.norm(x, axis=1, keepdims=True)
-    n[n == 0] = 1.0
-    return x / n
+def get_sentence_vectors_batch(model, terms: list[str]) -> np.ndarray:
+    """
+    Embed all terms into one (N, d) float32 matrix.
+
+    Word vectors come from get_word_vector, once per distinct word — the
+    same subword-aware lookup get_sentence_vector uses per call, so the
+    index lives in the exact space the query() embeddings are searched
+    in. For embedding .bin models get_sentence_vector averages the
+    unit-normalized token vectors, dividing by the number of tokens with
+    nonzero norm (no EOS token on this branch); each term's segment is
+    reduced in one np.add.reduceat pass the same way. Tokenless terms
+    come back as zero rows, matching fastText.
+    """
+    X = np.zeros((len(terms), model.get_dimension()), dtype="float32")
+
+    tokens_per_term = [term.split() for term in terms]
+    batched_rows = [i for i, tokens in enumerate(tokens_per_term) if tokens]
+    if not batched_rows:
+        return X
+
+    word_row: dict[str, int] = {}
+    for i in batched_rows:
+        for w in tokens_per_term[i]:
+            if w not in word_row:
+                word_row[w] = len(word_row)
+    V = np.stack(
+        [model.get_word_vector(w) for w in word_row]
+    ).astype("float32")
+    norms = np.sqrt(np.einsum("ij,ij->i", V, V))[:, None]
+    np.divide(V, norms, out=V, where=norms > 0)
+    has_norm = (norms[:, 0] > 0).astype("float32")
+
+    flat_rows = np.fromiter(
+        (word_row[w] for i in batched_rows for w in tokens_per_term[i]),
+        dtype=np.int64,
+    )
+    lengths = np.array([len(tokens_per_term[i]) for i in batched_rows])
+    offsets = np.concatenate(([0], np.cumsum(lengths[:-1])))
+    sums = np.add.reduceat(V[flat_rows], offsets, axis=0)
+    counts = np.add.reduceat(has_norm[flat_rows], offsets)
+    # all-zero-norm terms have zero sums, so the clamp just avoids 0/0
+    X[batched_rows] = sums / np.maximum(counts, 1.0)[:, None]
+    return X
 
 
 def build_subset_index(model, terms: list[str]) -> tuple[faiss.Index, list[str]]:
@@ -40,11 +79,30 @@ def build_subset_index(model, terms: list[str]) -> tuple[faiss.Index, list[str]]
     """
     dim = model.get_dimension()
 
-    # Use sentence vectors so multi-word symptoms work out of the box
-    X = np.vstack([model.get_sentence_vector(t) for t in terms]).astype("float32")
-    X = normalize_rows(X)
-
-    index = faiss.IndexFlatIP(dim)  # exact search, usually fast enough for subset
+    # Use sentence vectors so multi-word symptoms work out of the box.
+    # normalize_L2 is FAISS's AVX in-place kernel: one pass, no temporary.
+    X = get_sentence_vectors_batch(model, terms)
+    faiss.normalize_L2(X)
+
+    # fp16 storage halves the bytes the bandwidth-bound IP scan has to
+    # move per query; queries still arrive as fp32.
+    if len(terms) < 1000:
+        # Exact scan beats IVF below ~1k vectors
+        index = faiss.IndexScalarQuantizer(
+            dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(X)
+    else:
+        # IVF: queries only probe nprobe of nlist partitions, sublinear
+        # in vocabulary size once it grows past a few thousand terms
+        nlist = min(64, max(4, int(np.sqrt(len(terms)))))
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFScalarQuantizer(
+            quantizer, dim, nlist,
+            faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(X)
+        index.nprobe = 8
     index.add(X)
 
     return index, terms
@@ -52,7 +110,7 @@ def build_subset_index(model, terms: list[str]) -> tuple[faiss.Index, list[str]]
 
 def query(index: faiss.Index, words: list[str], model, term: str, k: int = 10):
     q = np.array(model.get_sentence_vector(term), dtype="float32").reshape(1, -1)
-    q = normalize_rows(q)
+    faiss.normalize_L2(q)
 
     D, I = index.search(q, k)
     return [(words[i], float(D[0][j])) for j, i in enumerate(I[0])]
@@ -63,7 +121,7 @@ def main():
     OUT_DIR.mkdir(parents=True, exist_ok=True)
 
     print("Loading fastText model...")
-    model = fasttext.load_model(str(MODEL_PATH))
+    model = load_model_shared(MODEL_PATH)
 
     print("Reading candidates...")
     candidates = read_candidates(CAND_PATH)
@@ -0,0 +1,135 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import json
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import faiss
+from model_loader import load_model_shared
+
+from _ttl_cache import load_symptom_uris
+from SynonymsGen import build_subset_index
+
+# --------- paths ----------
+BASE_DIR = Path(__file__).resolve().parent
+
+MODEL_PATH = BASE_DIR / "BioSentVec_PubMed_MIMICIII-bigram_d700.bin"
+TTL_PATH = BASE_DIR.parent / "ontology" / "databaseV6.ttl"
+
+OUT_DIR = BASE_DIR / "faiss_subset1"
+INDEX_PATH = OUT_DIR / "index.faiss"
+WORDS_PATH = OUT_DIR / "words1.json"
+
+WIKIDATA_SPARQL = "https://query.wikidata.org/sparql"
+HEADERS = {"User-Agent": "KDE-SynonymsVec/1.0 (mailto:your-email@example.com)"}
+QID_CHUNK_SIZE = 200
+
+# One keep-alive session for all chunks: the TLS handshake dominates
+# latency for these small payloads, so pay it once per connection. Pool
+# size matches the fetch thread pool; transient failures get retried.
+_SESSION = requests.Session()
+_SESSION.headers.update(HEADERS)
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=4,
+        max_retries=Retry(total=3, backoff_factor=1.0),
+    ),
+)
+
+
+# --------- helpers ----------
+def uri_to_term(uri: str) -> str:
+    """sym:itching_eyes -> 'itching eyes'."""
+    return uri.rsplit("/", 1)[-1].replace("_", " ").strip()
+
+
+def extract_wd_qids_from_ttl(ttl_path: Path) -> list[str]:
+    """Q-IDs of the wd: entities (diseases) appearing in the ontology."""
+    prefix = "http://www.wikidata.org/entity/Q"
+    qids = set()
+    from rdflib import Graph
+
+    g = Graph()
+    g.parse(str(ttl_path), format="turtle")
+    for s in g.subjects():
+        s_str = str(s)
+        if s_str.startswith(prefix):
+            qids.add("Q" + s_str[len(prefix):])
+    return sorted(qids)
+
+
+def _fetch_one_batch(chunk: list[str]) -> dict[str, str]:
+    values = " ".join(f"wd:{q}" for q in chunk)
+    query = f"""
+    SELECT ?item ?itemLabel WHERE {{
+        VALUES ?item {{ {values} }}
+        SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en". }}
+    }}
+    """
+    response = _SESSION.get(
+        WIKIDATA_SPARQL,
+        params={"query": query, "format": "json"},
+        timeout=60,
+    )
+    response.raise_for_status()
+    return {
+        binding["item"]["value"].rsplit("/", 1)[-1]: binding["itemLabel"]["value"]
+        for binding in response.json()["results"]["bindings"]
+    }
+
+
+def fetch_labels_for_qids(qids: list[str]) -> dict[str, str]:
+    """
+    English labels for the given Q-IDs, queried in chunks of 200. The
+    chunks go out over four worker threads so network latency overlaps;
+    four stays well inside Wikidata's concurrency etiquette, and each
+    chunk's result dict is disjoint so the merge needs no locking.
+    """
+    chunks = [
+        qids[start:start + QID_CHUNK_SIZE]
+        for start in range(0, len(qids), QID_CHUNK_SIZE)
+    ]
+    labels: dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        for chunk_labels in pool.map(_fetch_one_batch, chunks):
+            labels.update(chunk_labels)
+    return labels
+
+
+# --------- main ----------
+def main():
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    print("Extracting symptom URIs from TTL (cached)...")
+    symptom_uris = load_symptom_uris(TTL_PATH)
+    terms = sorted({uri_to_term(u) for u in symptom_uris})
+    print("Num symptom terms:", len(terms))
+
+    print("Fetching disease labels from Wikidata...")
+    qids = extract_wd_qids_from_ttl(TTL_PATH)
+    labels = fetch_labels_for_qids(qids)
+    print("Num disease labels:", len(labels))
+
+    words = terms + sorted(
+        lbl.lower() for lbl in labels.values() if not lbl.startswith("Q")
+    )
+
+    print("Loading fastText model...")
+    model = load_model_shared(MODEL_PATH)
+
+    print("Building FAISS index...")
+    index, words = build_subset_index(model, words)
+
+    print("Saving index + words...")
+    faiss.write_index(index, str(INDEX_PATH))
+    WORDS_PATH.write_text(
+        json.dumps(words, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+
+    print("Done. Saved to:", OUT_DIR)
+
+
+if __name__ == "__main__":
+    main()
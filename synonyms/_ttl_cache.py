@@ -0,0 +1,92 @@
+"""
+Disk cache for symptom URIs extracted from an ontology TTL.
+
+rdflib's pure-Python turtle parser dominates the startup time of every
+script that only needs the symptom URI list; caching that list next to
+the TTL (keyed by size + mtime) turns repeat runs into a tiny JSON read.
+"""
+
+import json
+import re
+from pathlib import Path
+
+from rdflib import Graph, Namespace
+from rdflib.plugins.sparql import prepareQuery
+
+EX = Namespace("http://example.org/med#")
+
+# One prepared query walks the store once for all three symptom roles,
+# instead of three separate triples() generator passes.
+_SYMPTOM_QUERY = prepareQuery(
+    """
+    SELECT DISTINCT ?o WHERE {
+        ?s ?p ?o .
+        VALUES ?p { ex:hasPrimarySymptom ex:hasSecondarySymptom ex:hasRareSymptom }
+    }
+    """,
+    initNs={"ex": EX},
+)
+
+
+def _extract_symptom_uris(ttl_path: Path) -> list[str]:
+    g = Graph()
+    g.parse(str(ttl_path), format="turtle")
+    return sorted(str(row.o) for row in g.query(_SYMPTOM_QUERY))
+
+
+# Regex fast path: the symptom predicates only ever carry plain qname or
+# <IRI> object lists in our ontology, so a text scan can skip rdflib's
+# pure-Python turtle parser entirely. Each predicate's object list runs
+# until a statement-level ';' or '.' — one followed by whitespace or end
+# of file — so the dots inside <http://...> IRIs don't cut a list short.
+_PREFIXES = {
+    "wd": "http://www.wikidata.org/entity/",
+    "sym": "http://example.org/med#symptom/",
+    "ex": "http://example.org/med#",
+}
+_FAST_BLOCK = re.compile(
+    r"ex:has(?:Primary|Secondary|Rare)Symptom\b(.*?)[;.](?=\s|$)", re.S
+)
+_FAST_OBJECT = re.compile(r"<([^>]+)>|\b(wd|sym|ex):([\w-]+)")
+
+
+def _extract_symptom_uris_fast(ttl_path: Path) -> list[str]:
+    text = ttl_path.read_text(encoding="utf-8")
+    uris = set()
+    for block in _FAST_BLOCK.finditer(text):
+        for m in _FAST_OBJECT.finditer(block.group(1)):
+            if m.group(1):
+                uris.add(m.group(1))
+            else:
+                uris.add(_PREFIXES[m.group(2)] + m.group(3))
+    return sorted(uris)
+
+
+def load_symptom_uris(ttl_path: Path, fast: bool = True) -> list[str]:
+    """
+    Symptom URIs for the TTL, reparsing only when the file changed.
+    fast=False forces the rdflib parser, kept as the validation path for
+    the regex scan.
+    """
+    ttl_path = Path(ttl_path)
+    stat = ttl_path.stat()
+    key = f"{stat.st_size}:{stat.st_mtime_ns}"
+    cache_path = ttl_path.with_suffix(".symuris.json")
+
+    try:
+        payload = json.loads(cache_path.read_text(encoding="utf-8"))
+        if payload.get("key") == key:
+            return payload["uris"]
+    except (OSError, ValueError):
+        pass
+
+    uris = _extract_symptom_uris_fast(ttl_path) if fast else []
+    if not uris:
+        uris = _extract_symptom_uris(ttl_path)
+    try:
+        cache_path.write_text(
+            json.dumps({"key": key, "uris": uris}), encoding="utf-8"
+        )
+    except OSError:
+        pass  # cache is best-effort
+    return uris
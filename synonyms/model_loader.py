@@ -0,0 +1,24 @@
+"""
+Shared loader for the BioSentVec fastText model.
+
+The .bin is multi-gigabyte, so every component that loads it privately
+adds a full copy to the process's RSS. A per-process cache hands the
+same loaded model to every caller in that process instead. The fasttext
+binding has no mmap mode, so separate processes still pay for their own
+copy; sharing across workers means loading before fork so the pages
+stay copy-on-write.
+"""
+
+from functools import lru_cache
+from pathlib import Path
+
+import fasttext
+
+
+@lru_cache(maxsize=2)
+def _load(resolved: str):
+    return fasttext.load_model(resolved)
+
+
+def load_model_shared(path: Path):
+    return _load(str(Path(path).resolve()))